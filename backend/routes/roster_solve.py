@@ -6,8 +6,8 @@ Flask route for roster solving API - v3 Pattern-Based
 from flask import Blueprint, request, jsonify
 import sys
 import os
-import traceback
-import json
+import logging
+import orjson
 
 # Add paths
 ROUTES_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -26,23 +26,24 @@ from roster_solver import (
     load_shop_config,
     DAYS_OF_WEEK,
     get_day_index,
-    EXCLUDED_EMPLOYEES
+    EXCLUDED_EMPLOYEES_LOWER
 )
 
 roster_solve_bp = Blueprint('roster_solve', __name__)
+log = logging.getLogger(__name__)
 
 
 def safe_json_parse(value, default=None):
     """Safely parse JSON, handling strings, dicts, and None"""
     if value is None:
         return default
-    if isinstance(value, dict) or isinstance(value, list):
-        return value  # Already parsed!
-    if isinstance(value, str):
+    if isinstance(value, (str, bytes)):
         try:
-            return json.loads(value)
-        except:
+            value = orjson.loads(value)
+        except orjson.JSONDecodeError:
             return default
+    if isinstance(value, (dict, list)):
+        return value  # Already parsed!
     return default
 
 
@@ -67,6 +68,7 @@ def solve_roster():
         am_only_names = set(data.get('amOnlyEmployees', []))
         fixed_days_off_raw = data.get('fixedDaysOff', {})
         previous_sunday_shifts = data.get('previousWeekSundayShifts', [])
+        previous_week_shifts = data.get('previousWeekShifts', [])
         
         print(f"\n{'='*60}")
         print(f"ROSTER SOLVE REQUEST")
@@ -108,7 +110,7 @@ def solve_roster():
             # Skip excluded
             if emp_id in excluded_ids:
                 continue
-            if emp_name in EXCLUDED_EMPLOYEES:
+            if (emp_name or '').lower() in EXCLUDED_EMPLOYEES_LOWER:
                 print(f"  Excluding {emp_name} (never rostered)")
                 continue
             if not emp_data.get('isActive', True):
@@ -228,8 +230,8 @@ def solve_roster():
             }
         
         # Build templates and demands
-        templates, special_demands = build_templates_from_config(raw_shops)
-        demands = build_demands_from_config(raw_shops)
+        templates, special_demands = build_templates_from_config(shop_configs)
+        demands = build_demands_from_config(shop_configs)
         
         print(f"Templates: {len(templates)}")
         print(f"Demands: {len(demands)}")
@@ -245,6 +247,7 @@ def solve_roster():
             week_start=week_start,
             fixed_days_off=fixed_days_off,
             previous_week_sunday_shifts=previous_sunday_shifts,
+            previous_week_shifts=previous_week_shifts,
             shop_rules=shop_rules,
             special_demands=special_demands,
             shop_configs=shop_configs
@@ -255,8 +258,7 @@ def solve_roster():
         return jsonify(result)
     
     except Exception as e:
-        print(f"\nSOLVER ERROR:")
-        traceback.print_exc()
+        log.exception("Roster solve failed")
         
         return jsonify({
             'success': False,
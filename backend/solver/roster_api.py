@@ -1,8 +1,10 @@
 ﻿from flask import Flask, request, jsonify
 from flask_cors import CORS
+import logging
 import os
 
 app = Flask(__name__)
+log = logging.getLogger(__name__)
 CORS(app)
 
 # Import solver
@@ -93,6 +95,7 @@ def solve_roster():
             week_start=data.get('weekStart', '2026-02-02'),
             fixed_days_off=data.get('fixedDaysOff', {}),
             previous_week_sunday_shifts=data.get('previousWeekSundayShifts', {}),
+            previous_week_shifts=data.get('previousWeekShifts', []),
             shop_rules=data.get('shopRules', {}),
             special_demands=special_demands,
             shop_configs=shop_configs
@@ -104,8 +107,7 @@ def solve_roster():
         return jsonify(result)
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        log.exception("Roster solve failed")
         return jsonify({"success": False, "error": str(e)}), 500
 
 if __name__ == '__main__':
@@ -15,18 +15,38 @@ Public API unchanged:
 
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from ortools.sat.python import cp_model
-from datetime import datetime, timedelta
-import json, re
+from ortools.sat.python.cp_model import LinearExpr
+from datetime import date, datetime, timedelta
+from collections import defaultdict
+from functools import lru_cache
+import sys
+import logging
+import orjson
+
+log = logging.getLogger(__name__)
 
 # ────────────────────────────────────────────────────────────────────────────
 # CONSTANTS
 # ────────────────────────────────────────────────────────────────────────────
-BIG_STAFF_SHOPS = {"Hamrun", "Carters", "Fgura"}
-EXCLUDED_EMPLOYEES = {"Maria"}
+BIG_STAFF_SHOPS = frozenset(map(sys.intern, ("Hamrun", "Carters", "Fgura")))
+EXCLUDED_EMPLOYEES = frozenset(map(sys.intern, ("Maria",)))
+EXCLUDED_EMPLOYEES_LOWER = frozenset(n.lower() for n in EXCLUDED_EMPLOYEES)
+# Shops whose under-hours staff get their shifts extended after solving
+EXTEND_HOURS_SHOPS = frozenset(map(sys.intern, ("Fgura", "Carters")))
 DAYS_OF_WEEK = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
 DAY_NAME_MAP = {0: "Mon", 1: "Tue", 2: "Wed", 3: "Thu", 4: "Fri", 5: "Sat", 6: "Sun"}
+FULL_WEEK_MASK = (1 << 7) - 1
+# Lower-case full and three-letter day names -> day index (0=Mon)
+_DAY_INDEX = {name: i for i, name in enumerate(DAYS_OF_WEEK)}
+_DAY_INDEX.update({name[:3]: i for i, name in enumerate(DAYS_OF_WEEK)})
+
+# Every HH:MM of the day, indexed by minutes since midnight
+_MIN_TO_HHMM = tuple(f"{m // 60:02d}:{m % 60:02d}" for m in range(1440))
+
+# Template id suffixes per day: _ID_SUFFIX[day_idx] -> ("_0_AM", "_0_PM", "_0_FULL")
+_ID_SUFFIX = tuple(tuple(f"_{d}_{st}" for st in ("AM", "PM", "FULL")) for d in range(7))
 
 WEEK_TARGET = {
     "fulltime": 40, "full-time": 40,
@@ -46,16 +66,27 @@ PENALTY_UNDER_HOURS = 2000
 PENALTY_CROSS_SHOP = 30
 PENALTY_FULL_SHIFT = 300
 PENALTY_FULL_SHIFT_BIG = 3000
+PENALTY_UNBALANCED = 500     # |AM - PM| at big shops
+PENALTY_PM_STRONGER = 300    # PM > AM at big shops
 
 # Progressive OT penalties (new)
 PENALTY_OT_TIER1 = 200   # 2-5h OT
 PENALTY_OT_TIER2 = 500   # 5-10h OT
 PENALTY_OT_TIER3 = 1000  # 10h+ OT
 
+# Overtime slacks: (name, tenths of an hour above target, domain cap, penalty)
+OT_SLACKS = (
+    ("over", 0, 200, PENALTY_OVERTIME),
+    ("exc", OT_CAP * 10, 100, PENALTY_EXCESSIVE_OT),
+    ("over2", 20, 200, PENALTY_OT_TIER1),    # Over 2h
+    ("over5", 50, 200, PENALTY_OT_TIER2),    # Over 5h
+    ("over10", 100, 200, PENALTY_OT_TIER3),  # Over 10h
+)
+
 # ────────────────────────────────────────────────────────────────────────────
 # DATA MODELS
 # ────────────────────────────────────────────────────────────────────────────
-@dataclass
+@dataclass(slots=True)
 class Employee:
     id: int
     name: str
@@ -69,20 +100,20 @@ class Employee:
     secondary_shop_ids: List[int] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(slots=True)
 class LeaveRequest:
     employee_id: int
     start_date: str
     end_date: str
     leave_type: str
 
-@dataclass
+@dataclass(slots=True)
 class ShopAssignment:
     employee_id: int
     shop_id: int
     is_primary: bool
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ShiftTemplate:
     id: str
     shop_id: int
@@ -94,7 +125,7 @@ class ShiftTemplate:
     hours: float
     is_mandatory: bool = False
 
-@dataclass
+@dataclass(slots=True)
 class DemandEntry:
     shop_id: int
     shop_name: str
@@ -107,7 +138,7 @@ class DemandEntry:
     is_solo: bool
     max_staff: int = 10
 
-@dataclass
+@dataclass(slots=True)
 class SpecialShiftDemand:
     shop_id: int
     shop_name: str
@@ -117,14 +148,14 @@ class SpecialShiftDemand:
     start_time: str
     end_time: str
 
-@dataclass
+@dataclass(slots=True)
 class StaffingConfig:
     coverage_mode: str = "flexible"
     full_day_counts_as_both: bool = True
     never_below_minimum: bool = True
     weekly_schedule: List[Dict] = field(default_factory=list)
 
-@dataclass
+@dataclass(slots=True)
 class ShopConfig:
     id: int
     name: str
@@ -144,15 +175,22 @@ class ShopConfig:
     trim_from_start: int = 1
     trim_from_end: int = 2
     trim_when_more_than: int = 2
+    # weeklySchedule entries keyed by day index (0=Mon), derived from staffing_config
+    day_config_by_index: Dict[int, Dict] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if self.day_config_by_index or not self.staffing_config:
+            return
+        for d in self.staffing_config.weekly_schedule or ():
+            idx = get_day_index(d.get("day", "")[:3])
+            if idx >= 0 and idx not in self.day_config_by_index:
+                self.day_config_by_index[idx] = d
 
 # ────────────────────────────────────────────────────────────────────────────
 # HELPERS
 # ────────────────────────────────────────────────────────────────────────────
 def get_day_index(day_name: str) -> int:
-    mapping = {"mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6,
-               "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
-               "friday": 4, "saturday": 5, "sunday": 6}
-    return mapping.get(day_name.lower(), -1)
+    return _DAY_INDEX.get(day_name.lower(), -1)
 
 def parse_time(t: str) -> int:
     """Convert HH:MM to minutes since midnight."""
@@ -162,25 +200,74 @@ def parse_time(t: str) -> int:
     return int(parts[0]) * 60 + int(parts[1])
 
 def format_time(mins: int) -> str:
+    if 0 <= mins < 1440:
+        return _MIN_TO_HHMM[mins]
     h, m = divmod(mins, 60)
     return f"{h:02d}:{m:02d}"
 
 def calculate_hours(start: str, end: str) -> float:
     return max(0, (parse_time(end) - parse_time(start)) / 60)
 
+@lru_cache(maxsize=32)
+def _shift_window(open_t: str, close_t: str) -> Tuple[int, str, float, float, float]:
+    """(day length in minutes, AM/PM split time, AM hours, PM hours, FULL hours).
+
+    Shops mostly share opening hours, so this is computed once per distinct window.
+    """
+    open_mins = parse_time(open_t)
+    close_mins = parse_time(close_t)
+    split_mins = (open_mins + close_mins) // 2
+    # Same values as calculate_hours(), without re-parsing the strings
+    return (close_mins - open_mins, format_time(split_mins),
+            max(0, (split_mins - open_mins) / 60),
+            max(0, (close_mins - split_mins) / 60),
+            max(0, (close_mins - open_mins) / 60))
+
 def safe_json_parse(s: Any, default: Any = None):
     if s is None:
         return default
+    if isinstance(s, (str, bytes)):
+        try:
+            s = orjson.loads(s)
+        except orjson.JSONDecodeError:
+            return default
     if isinstance(s, (dict, list)):
         return s
-    try:
-        return json.loads(s)
-    except:
-        return default
+    return default
+
+def _coerce_emp_id(value: Any) -> Optional[int]:
+    """Employee id from an int or a digit string (JSON keys are strings), else None."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().isdecimal():
+        return int(value)
+    return None
 
 def get_employee_target_hours(emp_type: str) -> int:
     return WEEK_TARGET.get(emp_type.lower().replace(" ", ""), 40)
 
+@lru_cache(maxsize=256)
+def reachable_hour_totals(day_coeffs: Tuple[Tuple[int, ...], ...], cap: int) -> Tuple[int, ...]:
+    """Weekly totals (tenths of an hour, <= cap) reachable with at most one shift per day.
+
+    Bit i of ``reach`` is set when a total of i is reachable; each day ORs in
+    the previous set shifted by every shift length offered that day. Employees
+    with the same eligible shops share ``day_coeffs``, so results are cached.
+    """
+    mask = (1 << (cap + 1)) - 1
+    reach = 1
+    for coeffs in day_coeffs:
+        step = reach
+        for c in coeffs:
+            step |= reach << c
+        reach = step & mask
+    totals = []
+    while reach:
+        low = reach & -reach
+        totals.append(low.bit_length() - 1)
+        reach ^= low
+    return tuple(totals)
+
 # ────────────────────────────────────────────────────────────────────────────
 # LOADERS
 # ────────────────────────────────────────────────────────────────────────────
@@ -196,19 +283,22 @@ def load_staffing_config(raw: Any) -> Optional[StaffingConfig]:
     )
 
 def load_shop_config(raw: Dict) -> ShopConfig:
-    sunday = safe_json_parse(raw.get("sunday"), {}) or {}
-    special_shifts = safe_json_parse(raw.get("specialShifts"), []) or []
+    name = raw["name"]
+    if isinstance(name, str):
+        name = sys.intern(name)
+    sunday = safe_json_parse(raw.get("sunday")) or {}
+    special_shifts = safe_json_parse(raw.get("specialShifts")) or []
     staffing = load_staffing_config(raw.get("staffingConfig"))
-    trimming = safe_json_parse(raw.get("trimming"), {}) or {}
+    trimming = safe_json_parse(raw.get("trimming")) or {}
     
     return ShopConfig(
         id=raw["id"],
-        name=raw["name"],
+        name=name,
         company=raw.get("company", ""),
         open_time=raw.get("openTime", "06:30"),
         close_time=raw.get("closeTime", "21:30"),
         is_active=bool(raw.get("isActive", 1)),
-        can_be_solo=False if raw["name"] in BIG_STAFF_SHOPS else bool(raw.get("canBeSolo", False)),
+        can_be_solo=False if name in BIG_STAFF_SHOPS else bool(raw.get("canBeSolo", False)),
         min_staff_at_close=raw.get("minStaffAtClose", 1),
         sunday=sunday,
         special_shifts=special_shifts,
@@ -241,35 +331,34 @@ def build_templates_from_config(shop_configs) -> List[ShiftTemplate]:
         if not cfg.is_active:
             continue
         
-        staffing = cfg.staffing_config
-        sunday_closed = cfg.sunday.get("closed", False) if isinstance(cfg.sunday, dict) else False
+        sunday_dict = cfg.sunday if isinstance(cfg.sunday, dict) else {}
+        sunday_closed = sunday_dict.get("closed", False)
+        is_solo = cfg.can_be_solo and cfg.name not in BIG_STAFF_SHOPS
+        sid = str(cfg.id)
         
         for day_idx in range(7):
+            id_am, id_pm, id_full = _ID_SUFFIX[day_idx]
+            
             # Skip Sunday if closed
             if day_idx == 6 and sunday_closed:
                 continue
 
             # Get times for this day
-            sunday_dict = cfg.sunday if isinstance(cfg.sunday, dict) else {}
             if day_idx == 6 and sunday_dict.get("customHours", {}).get("enabled", False):
                 custom = sunday_dict["customHours"]
                 day_open = custom.get("openTime", cfg.open_time)
                 day_close = custom.get("closeTime", cfg.close_time)
-                print(f"    [DEBUG] {cfg.name} Sunday customHours: {day_open} - {day_close}")
+                log.debug("    %s Sunday customHours: %s - %s", cfg.name, day_open, day_close)
             else:
                 day_open = cfg.open_time
                 day_close = cfg.close_time
             
-            open_mins = parse_time(day_open)
-            close_mins = parse_time(day_close)
-            day_length = close_mins - open_mins
-            midpoint = (open_mins + close_mins) // 2
+            day_length, am_end, am_hours, pm_hours, full_hours = _shift_window(day_open, day_close)
             
             # For short days (6 hours or less), only create FULL template
             if day_length <= 360:  # 6 hours = 360 minutes
-                full_hours = calculate_hours(day_open, day_close)
                 templates.append(ShiftTemplate(
-                    id=f"{cfg.id}_{day_idx}_FULL",
+                    id=sid + id_full,
                     shop_id=cfg.id,
                     shop_name=cfg.name,
                     day_index=day_idx,
@@ -279,35 +368,23 @@ def build_templates_from_config(shop_configs) -> List[ShiftTemplate]:
                     hours=full_hours,
                     is_mandatory=False
                 ))
-                print(f"    {cfg.name} {DAY_NAME_MAP[day_idx]}: FULL only ({day_open}-{day_close}, {full_hours}h)")
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("    %s %s: FULL only (%s-%s, %sh)",
+                              cfg.name, DAY_NAME_MAP[day_idx], day_open, day_close, full_hours)
                 continue  # Skip AM/PM creation for short days
             
             am_start = day_open
-            am_end = format_time(midpoint)
-            pm_start = format_time(midpoint)
+            pm_start = am_end
             pm_end = day_close
-            
-            am_hours = calculate_hours(am_start, am_end)
-            pm_hours = calculate_hours(pm_start, pm_end)
-            full_hours = calculate_hours(am_start, pm_end)
 
             # Get day config from staffing
-            day_config = None
-            if staffing and staffing.weekly_schedule:
-                day_name = DAY_NAME_MAP.get(day_idx, "")
-                for d in staffing.weekly_schedule:
-                    if d.get("day", "")[:3].lower() == day_name.lower()[:3]:
-                        day_config = d
-                        break
-            
+            day_config = cfg.day_config_by_index.get(day_idx)
             is_mandatory = day_config.get("isMandatory", False) if day_config else False
             
-            is_solo = cfg.can_be_solo and cfg.name not in BIG_STAFF_SHOPS
-            
             # Solo shops: FULL, AM, PM templates
             if is_solo:
                 templates.append(ShiftTemplate(
-                    id=f"{cfg.id}_{day_idx}_FULL",
+                    id=sid + id_full,
                     shop_id=cfg.id,
                     shop_name=cfg.name,
                     day_index=day_idx,
@@ -318,7 +395,7 @@ def build_templates_from_config(shop_configs) -> List[ShiftTemplate]:
                     is_mandatory=is_mandatory
                 ))
                 templates.append(ShiftTemplate(
-                    id=f"{cfg.id}_{day_idx}_AM",
+                    id=sid + id_am,
                     shop_id=cfg.id,
                     shop_name=cfg.name,
                     day_index=day_idx,
@@ -329,7 +406,7 @@ def build_templates_from_config(shop_configs) -> List[ShiftTemplate]:
                     is_mandatory=is_mandatory
                 ))
                 templates.append(ShiftTemplate(
-                    id=f"{cfg.id}_{day_idx}_PM",
+                    id=sid + id_pm,
                     shop_id=cfg.id,
                     shop_name=cfg.name,
                     day_index=day_idx,
@@ -342,7 +419,7 @@ def build_templates_from_config(shop_configs) -> List[ShiftTemplate]:
             else:
                 # Non-solo: AM, PM, FULL
                 templates.append(ShiftTemplate(
-                    id=f"{cfg.id}_{day_idx}_AM",
+                    id=sid + id_am,
                     shop_id=cfg.id,
                     shop_name=cfg.name,
                     day_index=day_idx,
@@ -353,7 +430,7 @@ def build_templates_from_config(shop_configs) -> List[ShiftTemplate]:
                     is_mandatory=is_mandatory
                 ))
                 templates.append(ShiftTemplate(
-                    id=f"{cfg.id}_{day_idx}_PM",
+                    id=sid + id_pm,
                     shop_id=cfg.id,
                     shop_name=cfg.name,
                     day_index=day_idx,
@@ -363,8 +440,11 @@ def build_templates_from_config(shop_configs) -> List[ShiftTemplate]:
                     hours=pm_hours,
                     is_mandatory=is_mandatory
                 ))
+                # Hamrun Sundays are 2 AM + 2 PM only; a FULL template would just be pinned to 0
+                if day_idx == 6 and cfg.name == "Hamrun":
+                    continue
                 templates.append(ShiftTemplate(
-                    id=f"{cfg.id}_{day_idx}_FULL",
+                    id=sid + id_full,
                     shop_id=cfg.id,
                     shop_name=cfg.name,
                     day_index=day_idx,
@@ -395,17 +475,15 @@ def build_demands_from_config(shop_configs) -> List[DemandEntry]:
         if not cfg.is_active:
             continue
         
-        staffing = cfg.staffing_config
         sunday_dict = cfg.sunday if isinstance(cfg.sunday, dict) else {}
         sunday_closed = sunday_dict.get("closed", False)
         sunday_max = sunday_dict.get("maxStaff") or 4
+        is_solo = cfg.can_be_solo and cfg.name not in BIG_STAFF_SHOPS
         
         for day_idx in range(7):
             if day_idx == 6 and sunday_closed:
                 continue
             
-            is_solo = cfg.can_be_solo and cfg.name not in BIG_STAFF_SHOPS
-            
             # ──────────────────────────────────────────────────────────
             # SPECIAL CASE: Fgura/Carters Sunday - 2 FULL shifts only
             # ──────────────────────────────────────────────────────────
@@ -422,7 +500,7 @@ def build_demands_from_config(shop_configs) -> List[DemandEntry]:
                     is_solo=False,
                     max_staff=2
                 ))
-                print(f"    {cfg.name} Sun: 2 FULL shifts demand (08:00-13:00)")
+                log.debug("    %s Sun: 2 FULL shifts demand (08:00-13:00)", cfg.name)
                 continue  # Skip normal demand creation
             
             # Defaults
@@ -432,21 +510,18 @@ def build_demands_from_config(shop_configs) -> List[DemandEntry]:
             is_mandatory = False
             
             # Get from staffing config
-            if staffing and staffing.weekly_schedule:
-                day_name = DAY_NAME_MAP.get(day_idx, "")
-                for d in staffing.weekly_schedule:
-                    if d.get("day", "")[:3].lower() == day_name.lower()[:3]:
-                        min_am = d.get("minAM", 1)
-                        min_pm = d.get("minPM", 1)
-                        target_am = d.get("targetAM", min_am)
-                        target_pm = d.get("targetPM", min_pm)
-                        max_staff = d.get("maxStaff", 10)
-                        is_mandatory = d.get("isMandatory", False)
-                        break
+            d = cfg.day_config_by_index.get(day_idx)
+            if d:
+                min_am = d.get("minAM", 1)
+                min_pm = d.get("minPM", 1)
+                target_am = d.get("targetAM", min_am)
+                target_pm = d.get("targetPM", min_pm)
+                max_staff = d.get("maxStaff", 10)
+                is_mandatory = d.get("isMandatory", False)
             
             # Sunday override for max staff
             if day_idx == 6:
-                max_staff = min(max_staff or 10, sunday_max or 4)
+                max_staff = min(max_staff or 10, sunday_max)
             
             # Hamrun Sunday: 2 AM + 2 PM
             if day_idx == 6 and cfg.name == 'Hamrun':
@@ -495,9 +570,6 @@ def balance_and_extend_hours(shifts: List[Dict], employee_hours: Dict[int, float
     1. Hamrun: Apply specific trimming rules (ALWAYS 2+ coverage!)
     2. CMZ: Extend under-hours employees
     """
-    from collections import defaultdict
-    from datetime import datetime
-    
     print("\n[BALANCING HOURS]")
     
     # Build employee info
@@ -505,25 +577,27 @@ def balance_and_extend_hours(shifts: List[Dict], employee_hours: Dict[int, float
     emp_targets = {}
     for e in employees:
         emp_map[e.id] = e
+        emp_type = e.employment_type.lower()
         if e.weekly_hours and e.weekly_hours > 0:
             emp_targets[e.id] = e.weekly_hours
-        elif e.employment_type.lower() in ('student',):
+        elif emp_type == 'student':
             emp_targets[e.id] = 20
-        elif e.employment_type.lower() in ('part-time', 'parttime'):
+        elif emp_type in ('part-time', 'parttime'):
             emp_targets[e.id] = 30
         else:
             emp_targets[e.id] = 40
     
-    # Group shifts
+    # Group shifts (one pass)
     shifts_by_shop_day = defaultdict(list)
-    for i, s in enumerate(shifts):
-        key = (s["shopName"], s["date"])
-        shifts_by_shop_day[key].append(i)
-    
     shifts_by_emp = defaultdict(list)
     for i, s in enumerate(shifts):
+        shifts_by_shop_day[(s["shopName"], s["date"])].append(i)
         shifts_by_emp[s["employeeId"]].append(i)
     
+    # Parse each distinct date once
+    weekday_by_date = {d: datetime.strptime(d, "%Y-%m-%d").weekday()
+                       for d in {s["date"] for s in shifts}}
+    
     changes_made = 0
     
     # ─────────────────────────────────────────────────────────────────
@@ -531,12 +605,11 @@ def balance_and_extend_hours(shifts: List[Dict], employee_hours: Dict[int, float
     # ─────────────────────────────────────────────────────────────────
     print("\n  [Step 1: Hamrun trimming - ALWAYS 2+ coverage until PM]")
     
-    for (shop_name, date), indices in shifts_by_shop_day.items():
+    for (shop_name, day_str), indices in shifts_by_shop_day.items():
         if shop_name != "Hamrun":
             continue
         
-        shift_date = datetime.strptime(date, "%Y-%m-%d")
-        if shift_date.weekday() == 6:  # Skip Sunday
+        if weekday_by_date[day_str] == 6:  # Skip Sunday
             continue
         
         am_shifts = [i for i in indices if shifts[i]["shiftType"] == "AM"]
@@ -553,7 +626,7 @@ def balance_and_extend_hours(shifts: List[Dict], employee_hours: Dict[int, float
             # 4+ AM staff: 
             # 2 people (most OT): 06:30-12:00 (5.5h)
             # 2 people (least OT): 08:30-14:00 (5.5h) - cover until PM
-            print(f"    {date}: {am_count} AM staff - applying 4-staff rule")
+            print(f"    {day_str}: {am_count} AM staff - applying 4-staff rule")
             
             for idx in overtime_sorted[:2]:
                 s = shifts[idx]
@@ -584,7 +657,7 @@ def balance_and_extend_hours(shifts: List[Dict], employee_hours: Dict[int, float
             # Person 1 (least OT): stays full 06:30-14:00 (ANCHOR 1)
             # Person 2 (mid OT): stays full 06:30-14:00 (ANCHOR 2)
             # Person 3 (most OT): 08:30-12:30 (4h) - only this one trimmed
-            print(f"    {date}: 3 AM staff - trimming only 1 person (keeping 2 until PM)")
+            print(f"    {day_str}: 3 AM staff - trimming only 1 person (keeping 2 until PM)")
             
             # Sort by OT ascending (least first = anchors)
             least_ot_first = sorted(am_shifts, 
@@ -625,15 +698,14 @@ def balance_and_extend_hours(shifts: List[Dict], employee_hours: Dict[int, float
         if needed < 1:
             continue
         
-        emp_shops = set(shifts[i]["shopName"] for i in indices)
-        if not emp_shops.intersection({"Fgura", "Carters"}):
+        if EXTEND_HOURS_SHOPS.isdisjoint(shifts[i]["shopName"] for i in indices):
             continue
         
         print(f"    {emp.name}: needs +{needed:.0f}h")
         needed = round(needed)
         
         extendable = [i for i in indices 
-                     if datetime.strptime(shifts[i]["date"], "%Y-%m-%d").weekday() != 6]
+                     if weekday_by_date[shifts[i]["date"]] != 6]
         
         if not extendable:
             continue
@@ -684,38 +756,112 @@ class RosterSolver:
         previous_week_sunday_shifts: Dict[int, bool],
         shop_rules: Dict[int, Dict],
         special_demands: List[SpecialShiftDemand],
-        shop_configs: Dict[int, ShopConfig]
+        shop_configs: Dict[int, ShopConfig],
+        # CP-SAT tuning (num_workers=None keeps CP-SAT's default of all cores)
+        num_workers: Optional[int] = None,
+        linearization_level: int = 2,
+        optimize_with_core: bool = False,
+        log_search_progress: bool = False,
+        # Give shift variables readable names (only useful when dumping the model)
+        debug: bool = False,
+        # Last week's solved shifts (solve() output format), used as search hints
+        previous_week_shifts: Optional[List[Dict]] = None,
+        # Order interchangeable employees by hours (see _add_symmetry_breaking)
+        symmetry_breaking: bool = False
     ):
-        self.employees = [e for e in employees if e.name not in EXCLUDED_EMPLOYEES and e.is_active]
+        self.employees = [e for e in employees if (e.name or '').lower() not in EXCLUDED_EMPLOYEES_LOWER and e.is_active]
+        # Weekly target hours - use weekly_hours if set, otherwise use employment type
+        self.target_hours_by_emp: Dict[int, int] = {
+            e.id: e.weekly_hours if e.weekly_hours and e.weekly_hours > 0
+            else get_employee_target_hours(e.employment_type)
+            for e in self.employees
+        }
+        self.student_ids = frozenset(e.id for e in self.employees if e.employment_type.lower() == "student")
+        self.employee_by_id: Dict[int, Employee] = {e.id: e for e in self.employees}
         self.templates = templates
+        # Integer hour coefficients (tenths of an hour) used by every hours sum
+        self.hours10_by_tid: Dict[str, int] = {t.id: int(t.hours * 10) for t in templates}
+        self.templates_by_shop_day: Dict[Tuple[int, int], List[ShiftTemplate]] = defaultdict(list)
+        self.template_pos: Dict[str, int] = {}
+        for pos, t in enumerate(templates):
+            self.templates_by_shop_day[(t.shop_id, t.day_index)].append(t)
+            self.template_pos[t.id] = pos
         self.demands = demands
         self.assignments = assignments
+        self.assigned_shops_by_emp: Dict[int, set] = defaultdict(set)
+        self.primary_shops_by_emp: Dict[int, set] = defaultdict(set)
+        for a in assignments:
+            emp_id, shop_id = a.employee_id, a.shop_id
+            self.assigned_shops_by_emp[emp_id].add(shop_id)
+            if a.is_primary:
+                self.primary_shops_by_emp[emp_id].add(shop_id)
         self.leave = leave_requests
         self.week_start = datetime.strptime(week_start, "%Y-%m-%d")
+        self.day_dates = [(self.week_start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(7)]
+        # Employee id -> bitmask of leave days (bit d set = on leave on day d)
+        self.leave_mask_by_emp: Dict[int, int] = self._build_leave_map()
         self.fixed_days_off = fixed_days_off
         self.prev_sunday = previous_week_sunday_shifts
+        self.previous_week_shifts = previous_week_shifts or []
         self.shop_rules = shop_rules
         self.special_demands = special_demands
         self.shop_configs = shop_configs
+        self.active_shops_by_company: Dict[str, set] = defaultdict(set)
+        self.shop_id_by_name: Dict[str, int] = {}
+        for cfg in (shop_configs.values() if isinstance(shop_configs, dict) else shop_configs):
+            self.shop_id_by_name.setdefault(cfg.name, cfg.id)
+            if cfg.is_active:
+                self.active_shops_by_company[cfg.company].add(cfg.id)
+        
+        self.num_workers = num_workers
+        self.linearization_level = linearization_level
+        self.optimize_with_core = optimize_with_core
+        self.log_search_progress = log_search_progress
+        self.debug = debug
+        self.symmetry_breaking = symmetry_breaking
         
         self.model = cp_model.CpModel()
+        self._model_built = False
         self.shift_vars: Dict[Tuple[int, str], Any] = {}
+        # Side indexes over shift_vars, filled by _build_variables
+        self.vars_by_shop_day_type: Dict[Tuple[int, int, str], List[Any]] = defaultdict(list)
+        self.vars_by_emp_day: Dict[Tuple[int, int], List[Any]] = defaultdict(list)
+        self.vars_by_emp_day_type: Dict[Tuple[int, int, str], List[Any]] = defaultdict(list)
+        self.vars_by_emp: Dict[int, List[Tuple[ShiftTemplate, Any]]] = defaultdict(list)
+        # (shop, day, type) buckets that had a candidate before leave was applied;
+        # coverage rows are posted for these even when leave empties the bucket
+        self.staffable_buckets: set = set()
+        # (var, hours*10) per employee, split Mon-Sat / Sunday
+        self.hours_terms_by_emp: Dict[int, List[Tuple[Any, int]]] = defaultdict(list)
+        self.sunday_hours_terms_by_emp: Dict[int, List[Tuple[Any, int]]] = defaultdict(list)
+        # Objective as parallel (variable, weight) lists, see _penalize
+        self._objective_vars: List[Any] = []
+        self._objective_weights: List[int] = []
         
         print(f"\n[ROSTERPRO v32.6] Pattern-Based Solver")
         print(f"Employees: {len(self.employees)} | Templates: {len(self.templates)} | Demands: {len(self.demands)}")
-        print(f"Excluded: {EXCLUDED_EMPLOYEES} | Special Requests: {len(self.special_demands)}")
+        print(f"Excluded: {set(EXCLUDED_EMPLOYEES)} | Special Requests: {len(self.special_demands)}")
+
+    def _build_leave_map(self) -> Dict[int, int]:
+        """Employee id -> bitmask of the days (bit 0=Mon) of this week covered by leave."""
+        leave_map: Dict[int, int] = defaultdict(int)
+        week_ord = self.week_start.toordinal()
+        for lr in self.leave:
+            # Clip the leave range to this week's day offsets 0..6
+            first = max(0, date.fromisoformat(lr.start_date).toordinal() - week_ord)
+            last = min(6, date.fromisoformat(lr.end_date).toordinal() - week_ord)
+            if first <= last:
+                days = ((1 << (last + 1)) - 1) ^ ((1 << first) - 1)
+                leave_map[lr.employee_id] |= days
+        return dict(leave_map)
 
     def _shops_for_emp(self, emp: Employee) -> set:
         """Get shops this employee can work at."""
-        assigned = {a.shop_id for a in self.assignments if a.employee_id == emp.id}
+        assigned = self.assigned_shops_by_emp.get(emp.id)
         if assigned:
             return assigned
         # Default: all shops of same company
-        if isinstance(self.shop_configs, dict):
-            configs = self.shop_configs.values()
-        else:
-            configs = self.shop_configs
-        return {cfg.id for cfg in configs if cfg.company == emp.company and cfg.is_active}
+        return self.active_shops_by_company.get(emp.company, set())
 
     def _is_primary(self, emp_id: int, shop_id: int) -> bool:
         for a in self.assignments:
@@ -723,17 +869,74 @@ class RosterSolver:
                 return a.is_primary
         return False
 
+    def _add_shift_var(self, e: Employee, t: ShiftTemplate):
+        """Create the BoolVar for (employee, template) and register it in the side indexes."""
+        v = self.model.NewBoolVar(f"shift_{e.id}_{t.id}" if self.debug else "")
+        self.shift_vars[(e.id, t.id)] = v
+        self.vars_by_shop_day_type[(t.shop_id, t.day_index, t.shift_type)].append(v)
+        self.vars_by_emp_day[(e.id, t.day_index)].append(v)
+        self.vars_by_emp_day_type[(e.id, t.day_index, t.shift_type)].append(v)
+        self.vars_by_emp[e.id].append((t, v))
+        h10 = self.hours10_by_tid[t.id]
+        if t.day_index == 6:
+            self.sunday_hours_terms_by_emp[e.id].append((v, h10))
+        else:
+            self.hours_terms_by_emp[e.id].append((v, h10))
+
     def _build_variables(self):
+        if self.shift_vars:
+            # Already built; a second pass would leave orphan variables in the proto
+            return
         print("\n[BUILDING MODEL]")
+        leave_blocked = 0
+        # (eligible shops, leave mask) -> (candidate templates, templates blocked by leave);
+        # most employees share a shop set and have no leave, so this is built a few times
+        candidates_by_profile: Dict[Tuple[frozenset, int], Tuple[List[ShiftTemplate], int]] = {}
+        seen_shop_sets = set()
         for e in self.employees:
             eligible_shops = self._shops_for_emp(e)
+            if not eligible_shops:
+                continue
+            shop_set = frozenset(eligible_shops)
+            if shop_set not in seen_shop_sets:
+                seen_shop_sets.add(shop_set)
+                for shop_id in shop_set:
+                    for day_idx in range(7):
+                        for t in self.templates_by_shop_day.get((shop_id, day_idx), ()):
+                            self.staffable_buckets.add((shop_id, day_idx, t.shift_type))
 
-            for t in self.templates:
-                if t.shop_id not in eligible_shops:
-                    continue
-                key = (e.id, t.id)
-                self.shift_vars[key] = self.model.NewBoolVar(f"shift_{e.id}_{t.id}")
+            # Leave days get no variables at all
+            leave_mask = self.leave_mask_by_emp.get(e.id, 0)
+            if leave_mask == FULL_WEEK_MASK:
+                leave_blocked += sum(
+                    len(self.templates_by_shop_day.get((shop_id, day_idx), ()))
+                    for shop_id in eligible_shops
+                    for day_idx in range(7)
+                )
+                continue
+
+            profile = (shop_set, leave_mask)
+            entry = candidates_by_profile.get(profile)
+            if entry is None:
+                candidates, blocked = [], 0
+                for shop_id in eligible_shops:
+                    for day_idx in range(7):
+                        day_templates = self.templates_by_shop_day.get((shop_id, day_idx), ())
+                        if leave_mask >> day_idx & 1:
+                            blocked += len(day_templates)
+                        else:
+                            candidates.extend(day_templates)
+                # Keep template order so variables (and output shifts) come out
+                # in the same order as a plain walk over self.templates
+                candidates.sort(key=lambda t: self.template_pos[t.id])
+                entry = candidates_by_profile[profile] = (candidates, blocked)
+            candidates, blocked = entry
+            leave_blocked += blocked
+            for t in candidates:
+                self._add_shift_var(e, t)
         print(f"Variables: {len(self.shift_vars)}")
+        if leave_blocked > 0:
+            print(f"  Leave requests: skipped {leave_blocked} shift options")
         
         # Debug: check which employees can work where
         print("\n[DEBUG] Employee-Shop Eligibility:")
@@ -744,139 +947,146 @@ class RosterSolver:
 
         # Debug: show assignments for Hamrun
         print("\n[DEBUG] Hamrun Assignments:")
-        hamrun_id = None
-        if isinstance(self.shop_configs, dict):
-            for sid, cfg in self.shop_configs.items():
-                if cfg.name == "Hamrun":
-                    hamrun_id = sid
-                    break
-        else:
-            for cfg in self.shop_configs:
-                if cfg.name == "Hamrun":
-                    hamrun_id = cfg.id
-                    break
+        hamrun_id = self.shop_id_by_name.get("Hamrun")
         if hamrun_id:
             for a in self.assignments:
                 if a.shop_id == hamrun_id:
-                    emp = next((e for e in self.employees if e.id == a.employee_id), None)
+                    emp = self.employee_by_id.get(a.employee_id)
                     print(f"  {emp.name if emp else a.employee_id} - {'PRIMARY' if a.is_primary else 'SECONDARY'}")
 
     def _add_coverage_constraints(self):
         print("\n[COVERAGE CONSTRAINTS]")
+        cov_index = self.vars_by_shop_day_type
+        buckets = self.staffable_buckets
         for d in self.demands:
-            if isinstance(self.shop_configs, dict):
-                cfg = self.shop_configs.get(d.shop_id)
-            else:
-                cfg = next((c for c in self.shop_configs if c.id == d.shop_id), None)
-            
             solo_str = "SOLO" if d.is_solo else f"min {d.min_am}AM/{d.min_pm}PM"
             print(f"  {d.shop_name} {DAY_NAME_MAP.get(d.day_index, '?')}: {solo_str}, maxStaff={d.max_staff}")
             
-            am = []
-            pm = []
-            full = []
-            
-            for (eid, tid), v in self.shift_vars.items():
-                tt = next((x for x in self.templates if x.id == tid), None)
-                if not tt or tt.shop_id != d.shop_id or tt.day_index != d.day_index:
-                    continue
-                if tt.shift_type == "AM":
-                    am.append(v)
-                elif tt.shift_type == "PM":
-                    pm.append(v)
-                else:
-                    full.append(v)
+            am = cov_index.get((d.shop_id, d.day_index, "AM"), [])
+            pm = cov_index.get((d.shop_id, d.day_index, "PM"), [])
+            full = cov_index.get((d.shop_id, d.day_index, "FULL"), [])
             
             am_cov = am + full
             pm_cov = pm + full
             all_vars = am + pm + full
+            # Lower bounds follow who could staff the bucket before leave, so a
+            # bucket emptied by leave still posts its (now infeasible) minimum
+            has_am = (d.shop_id, d.day_index, "AM") in buckets
+            has_pm = (d.shop_id, d.day_index, "PM") in buckets
+            has_full = (d.shop_id, d.day_index, "FULL") in buckets
+            has_am_cov = has_am or has_full
+            has_pm_cov = has_pm or has_full
+            
+            # Big shops: penalize unbalanced AM/PM and PM > AM (prefer AM stronger)
+            if not d.is_solo and d.shop_name in BIG_STAFF_SHOPS and am and pm:
+                self._add_balance_penalties(d, am, pm)
             
             # ──────────────────────────────────────────────────────────
             # SPECIAL: Fgura/Carters Sundays - exactly 2 FULL shifts
             # ──────────────────────────────────────────────────────────
             if d.day_index == 6 and d.shop_name in ('Fgura', 'Carters'):
-                if full:
-                    self.model.Add(sum(full) >= 2)
-                    self.model.Add(sum(full) <= 2)
+                if has_full:
+                    self.model.Add(LinearExpr.Sum(full) == 2)
                     print(f"    -> {d.shop_name} Sun: requiring exactly 2 FULL shifts (08:00-13:00)")
                 else:
                     print(f"    WARNING: {d.shop_name} Sun - no FULL variables found!")
-                if all_vars:
-                    self.model.Add(sum(all_vars) <= 2)
+                if len(all_vars) > 2:
+                    self.model.Add(LinearExpr.Sum(all_vars) <= 2)
                 continue  # Skip normal AM/PM logic
             
             # ──────────────────────────────────────────────────────────
             # SPECIAL: Hamrun Sundays - 2 AM + 2 PM (no FULL)
             # ──────────────────────────────────────────────────────────
             if d.day_index == 6 and d.shop_name == 'Hamrun':
-                if am:
-                    self.model.Add(sum(am) >= 2)
-                if pm:
-                    self.model.Add(sum(pm) >= 2)
+                if has_am:
+                    self.model.Add(LinearExpr.Sum(am) >= 2)
+                if has_pm:
+                    self.model.Add(LinearExpr.Sum(pm) >= 2)
                 if full:
-                    self.model.Add(sum(full) == 0)
-                if all_vars:
-                    self.model.Add(sum(all_vars) <= 4)
+                    self.model.Add(LinearExpr.Sum(full) == 0)
+                if len(all_vars) > 4:
+                    self.model.Add(LinearExpr.Sum(all_vars) <= 4)
                 continue
 
             if d.is_solo:
                 # Solo shop: Either 1 FULL OR (1 AM + 1 PM), never mixed
-                if am_cov:
-                    self.model.Add(sum(am_cov) >= 1)
-                if pm_cov:
-                    self.model.Add(sum(pm_cov) >= 1)
+                if has_am_cov:
+                    self.model.AddBoolOr(am_cov)
+                if has_pm_cov:
+                    self.model.AddBoolOr(pm_cov)
                 
-                # If any FULL, no AM or PM allowed (exclusive)
+                # If any FULL, no AM or PM allowed (exclusive). With at most
+                # 2 staff, am + 2*full <= 2 forces am to 0 once a FULL is set.
                 if full and am and pm:
-                    has_full = self.model.NewBoolVar(f"has_full_{d.shop_id}_{d.day_index}")
-                    self.model.Add(sum(full) >= 1).OnlyEnforceIf(has_full)
-                    self.model.Add(sum(full) == 0).OnlyEnforceIf(has_full.Not())
-                    self.model.Add(sum(am) == 0).OnlyEnforceIf(has_full)
-                    self.model.Add(sum(pm) == 0).OnlyEnforceIf(has_full)
+                    self.model.Add(LinearExpr.WeightedSum(am + full, [1] * len(am) + [2] * len(full)) <= 2)
+                    self.model.Add(LinearExpr.WeightedSum(pm + full, [1] * len(pm) + [2] * len(full)) <= 2)
                 
                 # Max 1 FULL, max 2 total
-                if full:
-                    self.model.Add(sum(full) <= 1)
-                if all_vars:
-                    self.model.Add(sum(all_vars) <= 2)
+                if len(full) > 1:
+                    self.model.AddAtMostOne(full)
+                if len(all_vars) > 2:
+                    self.model.Add(LinearExpr.Sum(all_vars) <= 2)
             else:
                 # Non-solo BIG SHOPS
                 if d.shop_name in BIG_STAFF_SHOPS:
                     # Sunday special case: limited staff, allow FULL
                     if d.day_index == 6:  # Sunday
-                        if am_cov:
-                            self.model.Add(sum(am_cov) >= 1)
-                        if pm_cov:
-                            self.model.Add(sum(pm_cov) >= 1)
+                        if has_am_cov:
+                            self.model.Add(LinearExpr.Sum(am_cov) >= 1)
+                        if has_pm_cov:
+                            self.model.Add(LinearExpr.Sum(pm_cov) >= 1)
                         if full:
-                            self.model.Add(sum(full) <= 2)
+                            self.model.Add(LinearExpr.Sum(full) <= 2)
                     else:
                         # Mon-Sat: HARD minimum 2 AM and 2 PM
-                        if am_cov:
-                            self.model.Add(sum(am_cov) >= 2)
-                        if pm_cov:
-                            self.model.Add(sum(pm_cov) >= 2)
+                        if has_am_cov:
+                            self.model.Add(LinearExpr.Sum(am_cov) >= 2)
+                        if has_pm_cov:
+                            self.model.Add(LinearExpr.Sum(pm_cov) >= 2)
                         # NO full shifts Mon-Sat - force AM/PM splits
                         if full:
-                            self.model.Add(sum(full) == 0)
+                            self.model.Add(LinearExpr.Sum(full) == 0)
                 else:
-                    if am_cov:
-                        self.model.Add(sum(am_cov) >= 1)
-                    if pm_cov:
-                        self.model.Add(sum(pm_cov) >= 1)
+                    if has_am_cov:
+                        self.model.Add(LinearExpr.Sum(am_cov) >= 1)
+                    if has_pm_cov:
+                        self.model.Add(LinearExpr.Sum(pm_cov) >= 1)
                     if full:
-                        self.model.Add(sum(full) <= MAX_FULLDAY_PER_SHOP)
+                        self.model.Add(LinearExpr.Sum(full) <= MAX_FULLDAY_PER_SHOP)
 
                 # MANDATORY days: enforce target coverage
                 if d.is_mandatory:
-                    if am_cov:
-                        self.model.Add(sum(am_cov) >= d.target_am)
-                    if pm_cov:
-                        self.model.Add(sum(pm_cov) >= d.target_pm)
+                    if has_am_cov:
+                        self.model.Add(LinearExpr.Sum(am_cov) >= d.target_am)
+                    if has_pm_cov:
+                        self.model.Add(LinearExpr.Sum(pm_cov) >= d.target_pm)
                 
-                # Max staff
-                if all_vars:
-                    self.model.Add(sum(all_vars) <= d.max_staff)
+                # Max staff (trivially met when there are no more candidates than the cap)
+                if len(all_vars) > d.max_staff:
+                    self.model.Add(LinearExpr.Sum(all_vars) <= d.max_staff)
+
+    def _penalize(self, var, weight: int):
+        """Add weight * var to the objective."""
+        self._objective_vars.append(var)
+        self._objective_weights.append(weight)
+
+    def _add_balance_penalties(self, d: DemandEntry, am: List, pm: List):
+        # Penalize difference between AM-only and PM-only
+        am_count = self.model.NewIntVar(0, 10, f"am_cnt_{d.shop_id}_{d.day_index}")
+        pm_count = self.model.NewIntVar(0, 10, f"pm_cnt_{d.shop_id}_{d.day_index}")
+        self.model.Add(am_count == LinearExpr.Sum(am))
+        self.model.Add(pm_count == LinearExpr.Sum(pm))
+        diff_pos = self.model.NewIntVar(0, 10, f"diff_pos_{d.shop_id}_{d.day_index}")
+        diff_neg = self.model.NewIntVar(0, 10, f"diff_neg_{d.shop_id}_{d.day_index}")
+        self.model.Add(diff_pos >= am_count - pm_count)
+        self.model.Add(diff_neg >= pm_count - am_count)
+        self._penalize(diff_pos, PENALTY_UNBALANCED)
+        self._penalize(diff_neg, PENALTY_UNBALANCED)
+        
+        # Penalize when PM > AM
+        pm_excess = self.model.NewIntVar(0, 10, f"pm_excess_{d.shop_id}_{d.day_index}")
+        self.model.Add(pm_excess >= pm_count - am_count)
+        self._penalize(pm_excess, PENALTY_PM_STRONGER)
 
     def _add_special_constraints(self):
         print("\n[SPECIAL REQUEST CONSTRAINTS]")
@@ -889,219 +1099,282 @@ class RosterSolver:
     def _add_employee_constraints(self):
         print("\n[EMPLOYEE CONSTRAINTS]")
         
-        # ──────────────────────────────────────────────────────────
-        # LEAVE REQUESTS - Block shifts on leave days
-        # ──────────────────────────────────────────────────────────
-        leave_blocked = 0
-        for lr in self.leave:
-            leave_start = datetime.strptime(lr.start_date, "%Y-%m-%d")
-            leave_end = datetime.strptime(lr.end_date, "%Y-%m-%d")
-            
-            for day_idx in range(7):
-                shift_date = self.week_start + timedelta(days=day_idx)
-                if leave_start <= shift_date <= leave_end:
-                    # Block all shifts for this employee on this day
-                    for (eid, tid), v in self.shift_vars.items():
-                        if eid != lr.employee_id:
-                            continue
-                        t = next((x for x in self.templates if x.id == tid), None)
-                        if t and t.day_index == day_idx:
-                            self.model.Add(v == 0)
-                            leave_blocked += 1
-        
-        if leave_blocked > 0:
-            print(f"  Leave requests: blocked {leave_blocked} shift options")
+        # Max 1 shift per day
+        for day_vars in self.vars_by_emp_day.values():
+            if len(day_vars) > 1:
+                self.model.AddAtMostOne(day_vars)
         
         for e in self.employees:
-            emp_vars = [(tid, v) for (eid, tid), v in self.shift_vars.items() if eid == e.id]
-            
-            # Max 1 shift per day
-            for day_idx in range(7):
-                day_vars = [v for tid, v in emp_vars 
-                           if any(t.id == tid and t.day_index == day_idx for t in self.templates)]
-                if day_vars:
-                    self.model.Add(sum(day_vars) <= 1)
+            emp_vars = self.vars_by_emp.get(e.id, [])
             
             # ──────────────────────────────────────────────────────────
             # At least 1 day off Mon-Fri (max 4 shifts Mon-Fri)
             # ──────────────────────────────────────────────────────────
             weekday_vars = []
             for day_idx in range(5):  # Mon=0 to Fri=4
-                day_shifts = [v for tid, v in emp_vars 
-                             if any(t.id == tid and t.day_index == day_idx for t in self.templates)]
-                weekday_vars.extend(day_shifts)
+                weekday_vars.extend(self.vars_by_emp_day.get((e.id, day_idx), []))
             
             if weekday_vars:
                 # Max 4 shifts Mon-Fri = at least 1 day off
-                self.model.Add(sum(weekday_vars) <= 4)
+                self.model.Add(LinearExpr.Sum(weekday_vars) <= 4)
             
             # Max 6 shifts per week (entire week)
             all_emp_vars = [v for _, v in emp_vars]
             if all_emp_vars:
-                self.model.Add(sum(all_emp_vars) <= 6)
+                self.model.Add(LinearExpr.Sum(all_emp_vars) <= 6)
             
             # No consecutive FULL days
+            full_by_day = [self.vars_by_emp_day_type.get((e.id, day_idx, "FULL"), []) for day_idx in range(7)]
             for day_idx in range(6):
-                full_today = [v for tid, v in emp_vars 
-                             if any(t.id == tid and t.day_index == day_idx and t.shift_type == "FULL" 
-                                   for t in self.templates)]
-                full_tomorrow = [v for tid, v in emp_vars 
-                                if any(t.id == tid and t.day_index == day_idx + 1 and t.shift_type == "FULL" 
-                                      for t in self.templates)]
+                full_today = full_by_day[day_idx]
+                full_tomorrow = full_by_day[day_idx + 1]
                 if full_today and full_tomorrow:
-                    self.model.Add(sum(full_today) + sum(full_tomorrow) <= 1)
+                    self.model.AddAtMostOne(full_today + full_tomorrow)
             
             # Student cap: 20h
-            if e.employment_type.lower() == "student":
-                hour_terms = []
-                for tid, v in emp_vars:
-                    t = next((x for x in self.templates if x.id == tid), None)
-                    if t:
-                        hour_terms.append(v * int(t.hours * 10))
-                if hour_terms:
-                    self.model.Add(sum(hour_terms) <= 200)
+            if e.id in self.student_ids:
+                pairs = self.hours_terms_by_emp.get(e.id, []) + self.sunday_hours_terms_by_emp.get(e.id, [])
+                if pairs:
+                    self.model.Add(LinearExpr.WeightedSum(
+                        [v for v, _ in pairs], [h for _, h in pairs]) <= 200)
         
         print("  All employees: max 4 shifts Mon-Fri (1 day off required)")
 
+    def _add_symmetry_breaking(self):
+        """Order interchangeable employees by the hours they are given.
+
+        Employees with the same eligible and primary shops, target hours,
+        student cap and leave days can swap rosters without changing cost
+        or feasibility, so requiring non-increasing hours within such a group
+        (lowest id first) removes only permuted copies of solutions. Opt-in:
+        a warm-start roster that breaks the ordering becomes an infeasible hint.
+        """
+        groups: Dict[Tuple, List[int]] = defaultdict(list)
+        for e in self.employees:
+            if e.id not in self.vars_by_emp:
+                continue
+            key = (frozenset(self._shops_for_emp(e)), frozenset(self.primary_shops_by_emp.get(e.id, ())),
+                   self.target_hours_by_emp[e.id], e.id in self.student_ids,
+                   self.leave_mask_by_emp.get(e.id, 0))
+            groups[key].append(e.id)
+        added = 0
+        for emp_ids in groups.values():
+            emp_ids.sort()
+            for a, b in zip(emp_ids, emp_ids[1:]):
+                pairs_a = self.hours_terms_by_emp.get(a, []) + self.sunday_hours_terms_by_emp.get(a, [])
+                pairs_b = self.hours_terms_by_emp.get(b, []) + self.sunday_hours_terms_by_emp.get(b, [])
+                self.model.Add(
+                    LinearExpr.WeightedSum([v for v, _ in pairs_a], [h for _, h in pairs_a])
+                    >= LinearExpr.WeightedSum([v for v, _ in pairs_b], [h for _, h in pairs_b]))
+                added += 1
+        print(f"  Symmetry breaking: {added} ordering constraints")
+
     def _build_objective(self):
         print("\n[BUILDING OBJECTIVE]")
-        terms = []
         
         for e in self.employees:
-            emp_vars = [(tid, v) for (eid, tid), v in self.shift_vars.items() if eid == e.id]
+            target = self.target_hours_by_emp[e.id] * 10
             
-            # Get target - use weekly_hours if set, otherwise use employment type
-            if e.weekly_hours and e.weekly_hours > 0:
-                target = e.weekly_hours * 10
-            else:
-                target = get_employee_target_hours(e.employment_type) * 10
+            # Calculate total hours for this employee (Sunday excluded from weekly target)
+            pairs = self.hours_terms_by_emp.get(e.id, [])
             
-            # Calculate total hours for this employee
-            hour_terms = []
-            for tid, v in emp_vars:
-                t = next((x for x in self.templates if x.id == tid), None)
-                if t and t.day_index != 6:  # Exclude Sunday from weekly hours target
-                    hour_terms.append(v * int(t.hours * 10))
-            
-            if hour_terms:
-                total = self.model.NewIntVar(0, 600, f"hours_{e.id}")
-                self.model.Add(total == sum(hour_terms))
+            if pairs:
+                # Most hours this employee could be given; slacks that can never
+                # be positive are skipped and the rest get domains no wider than needed
+                max_total = sum(h for _, h in pairs)
+                hours = LinearExpr.WeightedSum([v for v, _ in pairs], [h for _, h in pairs])
                 
-                under = self.model.NewIntVar(0, 500, f"under_{e.id}")
-                over = self.model.NewIntVar(0, 200, f"over_{e.id}")
-                exc = self.model.NewIntVar(0, 100, f"exc_{e.id}")
+                # (name, tenths of an hour above target, slack upper bound, penalty)
+                slacks = []
+                for name, above, cap, penalty in OT_SLACKS:
+                    ub = min(cap, max_total - target - above)
+                    if ub > 0:
+                        slacks.append((name, above, ub, penalty))
                 
-                self.model.Add(under >= target - total)
-                self.model.Add(over >= total - target)
-                self.model.Add(exc >= total - target - OT_CAP * 10)
+                # Only materialise the total when more than one row reads it
+                # or its domain still has to enforce the 60h ceiling
+                if (target > 0) + bool(slacks) > 1 or max_total > 600:
+                    # Domain holds only the totals one-shift-per-day choices can reach
+                    day_coeffs = defaultdict(set)
+                    for t, _ in self.vars_by_emp[e.id]:
+                        if t.day_index != 6:
+                            day_coeffs[t.day_index].add(self.hours10_by_tid[t.id])
+                    domain = cp_model.Domain.FromValues(
+                        reachable_hour_totals(tuple(sorted(tuple(sorted(c)) for c in day_coeffs.values())),
+                                              min(600, max_total)))
+                    total = self.model.NewIntVarFromDomain(domain, f"hours_{e.id}")
+                    self.model.Add(total == hours)
+                else:
+                    total = hours
                 
-                terms.extend([
-                    under * PENALTY_UNDER_HOURS,
-                    over * PENALTY_OVERTIME,
-                    exc * PENALTY_EXCESSIVE_OT
-                ])
+                if target > 0:
+                    under = self.model.NewIntVar(0, min(500, target), f"under_{e.id}")
+                    self.model.Add(under >= target - total)
+                    self._penalize(under, PENALTY_UNDER_HOURS)
                 
                 # ──────────────────────────────────────────────────────────
-                # PROGRESSIVE OT PENALTY - Spread the load!
+                # OVERTIME + PROGRESSIVE OT PENALTY - Spread the load!
                 # The MORE overtime someone has, the HIGHER the penalty
                 # This prevents piling 12h OT on one person
                 # ──────────────────────────────────────────────────────────
-                over_2h = self.model.NewIntVar(0, 200, f"over2_{e.id}")
-                over_5h = self.model.NewIntVar(0, 200, f"over5_{e.id}")
-                over_10h = self.model.NewIntVar(0, 200, f"over10_{e.id}")
-                
-                self.model.Add(over_2h >= total - target - 20)   # Over 2h
-                self.model.Add(over_5h >= total - target - 50)   # Over 5h
-                self.model.Add(over_10h >= total - target - 100) # Over 10h
-                
-                terms.append(over_2h * PENALTY_OT_TIER1)   # Extra penalty for 2h+ OT
-                terms.append(over_5h * PENALTY_OT_TIER2)   # Extra penalty for 5h+ OT
-                terms.append(over_10h * PENALTY_OT_TIER3)  # Extra penalty for 10h+ OT
+                # The tiers are stated on "over" (always first) rather than
+                # on the hours sum, so each is a two-term row
+                over = None
+                for name, above, ub, penalty in slacks:
+                    slack = self.model.NewIntVar(0, ub, f"{name}_{e.id}")
+                    if over is None:
+                        self.model.Add(slack >= total - target)
+                        over = slack
+                    else:
+                        self.model.Add(slack >= over - above)
+                    self._penalize(slack, penalty)
         
-        # FULL shift penalties
-        for (eid, tid), v in self.shift_vars.items():
-            t = next((x for x in self.templates if x.id == tid), None)
-            if t and t.shift_type == "FULL":
-                if t.shop_name in BIG_STAFF_SHOPS:
-                    terms.append(v * PENALTY_FULL_SHIFT_BIG)
-                else:
-                    terms.append(v * PENALTY_FULL_SHIFT)
+        # Per-shift penalties: FULL shifts (heavier at big shops) and working
+        # outside the employee's primary shops. The template part is fixed per
+        # template, so it is computed once and each variable gets one coefficient.
+        tmpl_weight = {}
+        for t in self.templates:
+            if t.shift_type == "FULL":
+                tmpl_weight[t.id] = PENALTY_FULL_SHIFT_BIG if t.shop_name in BIG_STAFF_SHOPS else PENALTY_FULL_SHIFT
+            else:
+                tmpl_weight[t.id] = 0
+        for e in self.employees:
+            primary_shops = self.primary_shops_by_emp.get(e.id, ())
+            for t, v in self.vars_by_emp.get(e.id, []):
+                w = tmpl_weight[t.id]
+                if t.shop_id not in primary_shops:
+                    w += PENALTY_CROSS_SHOP
+                if w:
+                    self._penalize(v, w)
+        
+        print(f"{len(self._objective_vars)} terms")
+        print("  Progressive OT penalties: 2h+/5h+/10h+ tiers active")
+        if self._objective_vars:
+            self.model.Minimize(LinearExpr.WeightedSum(self._objective_vars, self._objective_weights))
 
-        # Penalty for unbalanced AM/PM at big shops
-        PENALTY_UNBALANCED = 500
-        for d in self.demands:
-            if d.is_solo or d.shop_name not in BIG_STAFF_SHOPS:
+    def _prev_sunday_ids(self) -> set:
+        """Employee ids that worked last Sunday (dict of id -> bool, or a list of ids / shift dicts)."""
+        prev = self.prev_sunday or {}
+        if isinstance(prev, dict):
+            candidates = [k for k, worked in prev.items() if worked]
+        else:
+            candidates = [item.get("employeeId") if isinstance(item, dict) else item for item in prev]
+        ids = set()
+        for value in candidates:
+            emp_id = _coerce_emp_id(value)
+            if emp_id is not None:
+                ids.add(emp_id)
+        return ids
+
+    def _prev_week_keys(self) -> set:
+        """(employee id, shop id, day index, shift type) for every shift of last week's roster.
+
+        This only feeds solver hints, so malformed entries are skipped rather than
+        failing the solve.
+        """
+        keys = set()
+        weekday_by_date: Dict[str, int] = {}
+        for s in self.previous_week_shifts or ():
+            if not isinstance(s, dict):
                 continue
-            am = []
-            pm = []
-            for (eid, tid), v in self.shift_vars.items():
-                tt = next((x for x in self.templates if x.id == tid), None)
-                if not tt or tt.shop_id != d.shop_id or tt.day_index != d.day_index:
-                    continue
-                if tt.shift_type == "AM":
-                    am.append(v)
-                elif tt.shift_type == "PM":
-                    pm.append(v)
-            if am and pm:
-                # Penalize difference between AM-only and PM-only
-                am_count = self.model.NewIntVar(0, 10, f"am_cnt_{d.shop_id}_{d.day_index}")
-                pm_count = self.model.NewIntVar(0, 10, f"pm_cnt_{d.shop_id}_{d.day_index}")
-                self.model.Add(am_count == sum(am))
-                self.model.Add(pm_count == sum(pm))
-                diff_pos = self.model.NewIntVar(0, 10, f"diff_pos_{d.shop_id}_{d.day_index}")
-                diff_neg = self.model.NewIntVar(0, 10, f"diff_neg_{d.shop_id}_{d.day_index}")
-                self.model.Add(diff_pos >= am_count - pm_count)
-                self.model.Add(diff_neg >= pm_count - am_count)
-                terms.append(diff_pos * PENALTY_UNBALANCED)
-                terms.append(diff_neg * PENALTY_UNBALANCED)
-            
-        # Penalty for PM > AM at big shops (prefer AM stronger)
-        PENALTY_PM_STRONGER = 300
-        for d in self.demands:
-            if d.is_solo or d.shop_name not in BIG_STAFF_SHOPS:
+            emp_id = _coerce_emp_id(s.get("employeeId"))
+            shop_id = _coerce_emp_id(s.get("shopId"))
+            if emp_id is None or shop_id is None:
                 continue
-            am = []
-            pm = []
-            for (eid, tid), v in self.shift_vars.items():
-                tt = next((x for x in self.templates if x.id == tid), None)
-                if not tt or tt.shop_id != d.shop_id or tt.day_index != d.day_index:
-                    continue
-                if tt.shift_type == "AM":
-                    am.append(v)
-                elif tt.shift_type == "PM":
-                    pm.append(v)
-            if am and pm:
-                # Penalize when PM > AM
-                pm_excess = self.model.NewIntVar(0, 10, f"pm_excess_{d.shop_id}_{d.day_index}")
-                self.model.Add(pm_excess >= sum(pm) - sum(am))
-                terms.append(pm_excess * PENALTY_PM_STRONGER)
-        
-        # Cross-shop penalty
-        for e in self.employees:
-            primary_shops = {a.shop_id for a in self.assignments 
-                           if a.employee_id == e.id and a.is_primary}
-            for (eid, tid), v in self.shift_vars.items():
-                if eid != e.id:
+            shift_date = s.get("date")
+            if not isinstance(shift_date, str):
+                continue
+            weekday = weekday_by_date.get(shift_date)
+            if weekday is None:
+                try:
+                    weekday = date.fromisoformat(shift_date[:10]).weekday()
+                except ValueError:
                     continue
-                t = next((x for x in self.templates if x.id == tid), None)
-                if t and t.shop_id not in primary_shops:
-                    terms.append(v * PENALTY_CROSS_SHOP)
-        
-        print(f"{len(terms)} terms")
-        print("  Progressive OT penalties: 2h+/5h+/10h+ tiers active")
-        if terms:
-            self.model.Minimize(sum(terms))
+                weekday_by_date[shift_date] = weekday
+            try:
+                keys.add((emp_id, shop_id, weekday, s.get("shiftType")))
+            except TypeError:  # unhashable shift type from bad JSON
+                continue
+        return keys
 
-    def solve(self, time_limit_seconds: int = 120) -> Dict:
+    def _add_hints(self):
+        """Warm start: repeat last week's roster when it is given, otherwise
+        suggest a Sunday off for anyone who worked last Sunday.
+
+        The two are not mixed: a roster with some of its Sunday shifts
+        hinted off is no longer feasible, and CP-SAT then does worse than
+        with no hint at all.
+        """
+        prev_keys = self._prev_week_keys()
+        hinted = 0
+        if prev_keys:
+            for emp_id in {k[0] for k in prev_keys}:
+                for t, v in self.vars_by_emp.get(emp_id, []):
+                    if (emp_id, t.shop_id, t.day_index, t.shift_type) in prev_keys:
+                        self.model.AddHint(v, 1)
+                        hinted += 1
+            if hinted:
+                print(f"  Hints: {hinted} shifts repeated from last week")
+            return
+        for emp_id in self._prev_sunday_ids():
+            for v in self.vars_by_emp_day.get((emp_id, 6), []):
+                self.model.AddHint(v, 0)
+                hinted += 1
+        if hinted:
+            print(f"  Hints: {hinted} Sunday shifts suggested off (worked last Sunday)")
+
+    def _build_model(self):
+        """Build variables, constraints, objective and hints once per solver instance."""
+        if self._model_built:
+            return
         self._build_variables()
         self._add_coverage_constraints()
         self._add_special_constraints()
         self._add_employee_constraints()
+        if self.symmetry_breaking:
+            self._add_symmetry_breaking()
         self._build_objective()
-        
+        self._add_hints()
+        self._model_built = True
+
+    def solve(self, time_limit_seconds: int = 120, solver_params: Optional[Dict[str, Any]] = None) -> Dict:
+        self._build_model()
+        self.model.ClearAssumptions()
+        return self._solve_model(time_limit_seconds, solver_params)
+
+    def resolve(self, days_off: Dict[int, Iterable[int]], time_limit_seconds: int = 120,
+                solver_params: Optional[Dict[str, Any]] = None) -> Dict:
+        """What-if solve: same model, with extra days off (employee id -> day indexes, 0=Mon).
+
+        The days off are passed to CP-SAT as assumption literals, so the model is
+        built only on the first call and every later call just swaps assumptions.
+        """
+        if self.symmetry_breaking:
+            # The hours ordering assumes interchangeable employees; per-employee days off break that
+            raise ValueError("resolve() cannot be combined with symmetry_breaking")
+        self._build_model()
+        self.model.ClearAssumptions()
+        self.model.AddAssumptions([
+            v.Not()
+            for emp_id, days in days_off.items()
+            for day_idx in days
+            for v in self.vars_by_emp_day.get((emp_id, day_idx), [])
+        ])
+        return self._solve_model(time_limit_seconds, solver_params)
+
+    def _solve_model(self, time_limit_seconds: int, solver_params: Optional[Dict[str, Any]]) -> Dict:
         print(f"\n[SOLVING] Time limit: {time_limit_seconds}s")
         solver = cp_model.CpSolver()
         solver.parameters.max_time_in_seconds = time_limit_seconds
+        if self.num_workers is not None:
+            solver.parameters.num_workers = self.num_workers
+        solver.parameters.linearization_level = self.linearization_level
+        solver.parameters.cp_model_presolve = True
+        solver.parameters.optimize_with_core = self.optimize_with_core
+        solver.parameters.log_search_progress = self.log_search_progress
+        # Per-call overrides of any CpSolver parameter, e.g. {"symmetry_level": 4}
+        for name, value in (solver_params or {}).items():
+            setattr(solver.parameters, name, value)
         status = solver.Solve(self.model)
         
         status_name = {
@@ -1120,26 +1393,26 @@ class RosterSolver:
         shifts = []
         emp_hours: Dict[int, float] = {e.id: 0 for e in self.employees}
         
-        for (eid, tid), v in self.shift_vars.items():
-            if solver.Value(v) == 1:
-                t = next((x for x in self.templates if x.id == tid), None)
-                e = next((x for x in self.employees if x.id == eid), None)
-                if t and e:
-                    shift_date = self.week_start + timedelta(days=t.day_index)
-                    shifts.append({
-                        "id": f"{eid}_{tid}",
-                        "date": shift_date.strftime("%Y-%m-%d"),
-                        "shopId": t.shop_id,
-                        "shopName": t.shop_name,
-                        "employeeId": eid,
-                        "employeeName": e.name,
-                        "startTime": t.start_time,
-                        "endTime": t.end_time,
-                        "hours": t.hours,
-                        "shiftType": t.shift_type,
-                        "isTrimmed": False
-                    })
-                    emp_hours[eid] += t.hours
+        # Read the whole solution vector once instead of one Value() call per variable
+        solution = solver.ResponseProto().solution
+        for e in self.employees:
+            for t, v in self.vars_by_emp.get(e.id, []):
+                if solution[v.Index()] != 1:
+                    continue
+                shifts.append({
+                    "id": f"{e.id}_{t.id}",
+                    "date": self.day_dates[t.day_index],
+                    "shopId": t.shop_id,
+                    "shopName": t.shop_name,
+                    "employeeId": e.id,
+                    "employeeName": e.name,
+                    "startTime": t.start_time,
+                    "endTime": t.end_time,
+                    "hours": t.hours,
+                    "shiftType": t.shift_type,
+                    "isTrimmed": False
+                })
+                emp_hours[e.id] += t.hours
         
         # Apply trimming
         shifts, emp_hours = apply_trimming(shifts, emp_hours, self.shop_configs)
@@ -1149,23 +1422,18 @@ class RosterSolver:
         
         # Print coverage summary
         print("\n[COVERAGE SUMMARY]")
-        from collections import defaultdict
         by_shop_day = defaultdict(lambda: {"AM": 0, "PM": 0, "FULL": 0})
         for s in shifts:
             by_shop_day[(s["shopName"], s["date"])][s["shiftType"]] += 1
-        for (shop, date), counts in sorted(by_shop_day.items()):
-            print(f"  {shop} {date}: AM={counts['AM']}, PM={counts['PM']}, FULL={counts['FULL']}")
+        for (shop, day_str), counts in sorted(by_shop_day.items()):
+            print(f"  {shop} {day_str}: AM={counts['AM']}, PM={counts['PM']}, FULL={counts['FULL']}")
         
         # Print employee hours
         print("\n[EMPLOYEE HOURS]")
         total_ot = 0
         for e in self.employees:
             hours = emp_hours.get(e.id, 0)
-            # Use weekly_hours if set
-            if e.weekly_hours and e.weekly_hours > 0:
-                target = e.weekly_hours
-            else:
-                target = get_employee_target_hours(e.employment_type)
+            target = self.target_hours_by_emp[e.id]
             ot = max(0, hours - target)
             total_ot += ot
             ot_str = f" [+{ot:.1f}h OT]" if ot > 0 else ""
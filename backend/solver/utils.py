@@ -2,24 +2,52 @@
 """
 Utility functions for roster solver - Trimming and helpers
 """
+import logging
+from collections import defaultdict
+from functools import lru_cache
+
+log = logging.getLogger(__name__)
+
+# Trimmed PM/FULL closers never finish before noon
+_NOON_MIN = 12 * 60
 
 
 def _time_to_minutes(hhmm):
     """Convert '06:30' to 390 minutes"""
+    return _parse_hhmm(hhmm) if isinstance(hhmm, str) else 0
+
+
+@lru_cache(maxsize=256)
+def _parse_hhmm(hhmm):
+    # Shift times come from a small set of clock strings, so parse each once
     if not hhmm:
         return 0
-    try:
-        h, m = map(int, hhmm.split(':'))
-        return h * 60 + m
-    except:
+    h, sep, m = hhmm.partition(':')
+    h, m = h.strip(), m.strip()
+    if not sep or not (h.isdecimal() and m.isdecimal()):
         return 0
+    return int(h) * 60 + int(m)
 
 
+@lru_cache(maxsize=1024)
 def _minutes_to_time(m):
     """Convert 390 minutes to '06:30'"""
-    if m < 0:
-        m = 0
-    return f"{m // 60:02d}:{m % 60:02d}"
+    h, mm = divmod(max(m, 0), 60)
+    return f"{h:02d}:{mm:02d}"
+
+
+# Trimming roles for a shift type: AM-prefixed shifts open, PM/FULL close
+_OTHER, _AM, _PM, _FULL = 0, 1, 2, 3
+_CLOSING_ROLES = {'PM': _PM, 'FULL': _FULL}
+
+
+@lru_cache(maxsize=64)
+def _shift_role(shift_type):
+    """Map a shiftType string to its trimming role ('am' -> _AM)"""
+    st = (shift_type or '').upper()
+    if st.startswith('AM'):
+        return _AM
+    return _CLOSING_ROLES.get(st, _OTHER)
 
 
 def apply_trimming(shifts, employee_hours, max_first_am_trim=1, max_last_pm_trim=2):
@@ -42,37 +70,51 @@ def apply_trimming(shifts, employee_hours, max_first_am_trim=1, max_last_pm_trim
         max_last_pm_trim: Hours to trim from last PM/FULL closer (default 2)
     
     Returns:
-        Tuple of (modified shifts, modified employee_hours)
+        Tuple of (shifts, employee_hours) - the same objects that were passed
+        in, updated in place; no copies are made
     """
-    if not shifts:
+    am_trim_min = int(max_first_am_trim * 60)
+    pm_trim_min = int(max_last_pm_trim * 60)
+    if not shifts or not (am_trim_min or pm_trim_min):
         return shifts, employee_hours
     
-    # Group by (shop, date)
-    per_shopday = {}
+    # Group by (shop, date), classifying the shift type once per shift
+    per_shopday = defaultdict(list)
     for s in shifts:
-        key = (s.get('shopId'), s.get('date'))
-        per_shopday.setdefault(key, []).append(s)
+        per_shopday[(s.get('shopId'), s.get('date'))].append((_shift_role(s.get('shiftType')), s))
     
     trimmed_count = 0
+    # Local binding for the per-shift loop below
+    parse = _time_to_minutes
     
     for (shop_id, date), day_shifts in per_shopday.items():
-        # Find AM openers and PM/FULL closers
-        openers = [s for s in day_shifts if s.get('shiftType', '').upper().startswith('AM')]
-        closers = [s for s in day_shifts if s.get('shiftType', '').upper() in ('PM', 'FULL')]
-        has_full = any(s.get('shiftType', '').upper() == 'FULL' for s in day_shifts)
+        # One pass: count AM openers, spot FULL shifts, and keep the earliest
+        # opener and latest PM/FULL closer (first one wins on ties)
+        first_opener = last_closer = None
+        first_start = last_end = 0
+        opener_count = 0
+        has_full = False
+        for role, s in day_shifts:
+            if role == _AM:
+                opener_count += 1
+                m = parse(s.get('startTime'))
+                if first_opener is None or m < first_start:
+                    first_opener, first_start = s, m
+            elif role:
+                has_full = has_full or role == _FULL
+                m = parse(s.get('endTime'))
+                if last_closer is None or m > last_end:
+                    last_closer, last_end = s, m
         
         # Trimming trigger: >1 AM person OR >=1 FULL-day person
-        should_trim = len(openers) > 1 or has_full
+        should_trim = opener_count > 1 or has_full
         
         if not should_trim:
             continue
         
         # Trim first AM opener (+1h to start) - only if >1 opener
-        if len(openers) > 1:
-            first_opener = min(openers, key=lambda s: _time_to_minutes(s.get('startTime', '00:00')))
-            trim_minutes = int(max_first_am_trim * 60)
-            old_start = _time_to_minutes(first_opener.get('startTime', '00:00'))
-            new_start = old_start + trim_minutes
+        if am_trim_min and opener_count > 1:
+            new_start = first_start + am_trim_min
             first_opener['startTime'] = _minutes_to_time(new_start)
             first_opener['hours'] = round(first_opener.get('hours', 0) - max_first_am_trim, 2)
             first_opener['isTrimmed'] = True
@@ -83,17 +125,15 @@ def apply_trimming(shifts, employee_hours, max_first_am_trim=1, max_last_pm_trim
                 employee_hours[emp_id] = round(employee_hours[emp_id] - max_first_am_trim, 2)
             
             trimmed_count += 1
-            print(f"    Trimmed AM start +1h: {first_opener.get('employeeName', emp_id)} at shop {shop_id} on {date}")
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Trimmed AM start +1h: %s at shop %s on %s",
+                          first_opener.get('employeeName', emp_id), shop_id, date)
         
-        # Trim last PM/FULL closer (-2h from end)
-        if closers and (has_full or len(openers) > 1):
-            last_closer = max(closers, key=lambda s: _time_to_minutes(s.get('endTime', '00:00')))
-            trim_minutes = int(max_last_pm_trim * 60)
-            old_end = _time_to_minutes(last_closer.get('endTime', '00:00'))
-            new_end = old_end - trim_minutes
-            
-            # Don't trim below reasonable end time
-            if new_end >= _time_to_minutes('12:00'):
+        # Trim last PM/FULL closer (-2h from end), but never below a
+        # reasonable end time
+        if pm_trim_min and last_closer is not None:
+            new_end = last_end - pm_trim_min
+            if new_end >= _NOON_MIN:
                 last_closer['endTime'] = _minutes_to_time(new_end)
                 last_closer['hours'] = round(last_closer.get('hours', 0) - max_last_pm_trim, 2)
                 last_closer['isTrimmed'] = True
@@ -104,8 +144,10 @@ def apply_trimming(shifts, employee_hours, max_first_am_trim=1, max_last_pm_trim
                     employee_hours[emp_id] = round(employee_hours[emp_id] - max_last_pm_trim, 2)
                 
                 trimmed_count += 1
-                print(f"    Trimmed PM end -2h: {last_closer.get('employeeName', emp_id)} at shop {shop_id} on {date}")
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("Trimmed PM end -2h: %s at shop %s on %s",
+                              last_closer.get('employeeName', emp_id), shop_id, date)
     
-    print(f"  Total trims applied: {trimmed_count}")
+    log.info("Total trims applied: %d", trimmed_count)
     
     return shifts, employee_hours
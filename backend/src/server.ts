@@ -396,7 +396,8 @@ app.post('/api/roster/solve', async (req, res) => {
       excludedEmployeeIds: req.body.excludedEmployeeIds || [],
       amOnlyEmployees: req.body.amOnlyEmployees || [],
       fixedDaysOff: req.body.fixedDaysOff || {},
-      previousWeekSundayShifts: req.body.previousWeekSundayShifts || []
+      previousWeekSundayShifts: req.body.previousWeekSundayShifts || [],
+      previousWeekShifts: req.body.previousWeekShifts || []
     };
     
     console.log(`Sending to Python solver: ${parsedShops.length} shops, ${parsedEmployees.length} employees`);